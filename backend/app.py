@@ -5,6 +5,10 @@ import uuid
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import time
+import glob
+from services.analysis_scheduler import (
+    AnalysisScheduler, SchedulerSaturated, estimate_analysis_cost, estimate_sentence_count
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -14,9 +18,42 @@ UPLOAD_FOLDER = '../uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Admission control and fair queueing across sessions for /api/analyze.
+# With several worker processes set SHARED_SCHEDULER=1 so they all admit
+# through the one scheduler hosted by the inference server.
+if os.getenv('SHARED_SCHEDULER'):
+    from services.inference_server import SharedAnalysisScheduler
+    scheduler = SharedAnalysisScheduler()
+else:
+    scheduler = AnalysisScheduler(
+        max_concurrent=2,
+        max_queue_depth=32,
+        session_max_concurrent=1,
+        session_cost_budget=2000.0,
+        max_wait_seconds=60.0
+    )
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def uploaded_file_size(filename):
+    """Size of the most recent upload of a file name, or None if it was never uploaded"""
+    filename = secure_filename(filename)
+    if not filename:
+        return None
+    uploads = glob.glob(os.path.join(UPLOAD_FOLDER, f"*_{filename}"))
+    if not uploads:
+        return None
+    return os.path.getsize(max(uploads, key=os.path.getmtime))
+
+def estimate_request_cost(filenames):
+    """Analysis cost from the server's own view of the named documents"""
+    sizes = [uploaded_file_size(name) for name in dict.fromkeys(filenames)]
+    # An analysis always compares at least one pair
+    sizes += [None] * (2 - len(sizes))
+    sentence_count = sum(estimate_sentence_count(size) for size in sizes)
+    return estimate_analysis_cost(len(sizes), sentence_count)
+
 @app.route("/api/health", methods=["GET"])
 def health_check():
     return jsonify({
@@ -28,7 +65,8 @@ def health_check():
             "GET /api/health",
             "POST /api/upload",
             "POST /api/analyze",
-            "GET /api/usage/<session_id>"
+            "GET /api/usage/<session_id>",
+            "GET /api/scheduler/stats"
         ]
     })
 
@@ -73,52 +111,71 @@ def upload_documents():
 @app.route("/api/analyze", methods=["POST"])
 def analyze_documents():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         session_id = data.get('session_id', 'demo-session')
         
-        # Demo contradictions
-        demo_contradictions = [
-            {
-                'type': 'numerical',
-                'document1': 'policy1.txt',
-                'document2': 'policy2.txt',
-                'sentence1': 'Students must maintain minimum 75% attendance',
-                'sentence2': 'Students with 65% attendance are eligible',
-                'description': 'Conflicting attendance requirements: 75% vs 65%',
-                'severity_score': 0.9,
-                'suggestion': 'Clarify the correct attendance percentage'
-            },
-            {
-                'type': 'time',
-                'document1': 'policy1.txt',
-                'document2': 'policy2.txt',
-                'sentence1': 'Deadline is 11:59 PM',
-                'sentence2': 'Submit before 10:00 PM',
-                'description': 'Conflicting deadlines: 11:59 PM vs 10:00 PM',
-                'severity_score': 0.8,
-                'suggestion': 'Standardize submission deadline'
-            }
-        ]
+        files = data.get('files', [])
+        if not isinstance(files, list) or not all(isinstance(name, str) for name in files):
+            return jsonify({'error': 'files must be a list of file names'}), 400
+        if not isinstance(session_id, str):
+            return jsonify({'error': 'session_id must be a string'}), 400
         
-        return jsonify({
-            'message': 'Analysis completed successfully!',
-            'report': {
-                'session_id': session_id,
-                'timestamp': datetime.now().isoformat(),
-                'total_contradictions': len(demo_contradictions),
-                'contradictions': demo_contradictions,
-                'summary': {
-                    'numerical_conflicts': 1,
-                    'time_conflicts': 1,
-                    'policy_conflicts': 0
+        # Cost comes from the uploaded files, never from client-supplied counts
+        cost = estimate_request_cost(files)
+        
+        with scheduler.admit(session_id, cost):
+            # Demo contradictions
+            demo_contradictions = [
+                {
+                    'type': 'numerical',
+                    'document1': 'policy1.txt',
+                    'document2': 'policy2.txt',
+                    'sentence1': 'Students must maintain minimum 75% attendance',
+                    'sentence2': 'Students with 65% attendance are eligible',
+                    'description': 'Conflicting attendance requirements: 75% vs 65%',
+                    'severity_score': 0.9,
+                    'suggestion': 'Clarify the correct attendance percentage'
                 },
-                'status': 'Demo analysis - working perfectly!'
-            }
-        })
+                {
+                    'type': 'time',
+                    'document1': 'policy1.txt',
+                    'document2': 'policy2.txt',
+                    'sentence1': 'Deadline is 11:59 PM',
+                    'sentence2': 'Submit before 10:00 PM',
+                    'description': 'Conflicting deadlines: 11:59 PM vs 10:00 PM',
+                    'severity_score': 0.8,
+                    'suggestion': 'Standardize submission deadline'
+                }
+            ]
+        
+            return jsonify({
+                'message': 'Analysis completed successfully!',
+                'report': {
+                    'session_id': session_id,
+                    'timestamp': datetime.now().isoformat(),
+                    'total_contradictions': len(demo_contradictions),
+                    'contradictions': demo_contradictions,
+                    'summary': {
+                        'numerical_conflicts': 1,
+                        'time_conflicts': 1,
+                        'policy_conflicts': 0
+                    },
+                    'status': 'Demo analysis - working perfectly!'
+                }
+            })
     
+    except SchedulerSaturated as e:
+        response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+        if e.retry_after is not None:
+            response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route("/api/scheduler/stats", methods=["GET"])
+def get_scheduler_stats():
+    return jsonify(scheduler.stats())
+
 @app.route("/api/usage/<session_id>", methods=["GET"])
 def get_usage_stats(session_id):
     return jsonify({
@@ -0,0 +1,119 @@
+"""Compare the streaming DOCX extractor with the python-docx object model path.
+
+Each path runs in its own fresh process and reports that process's peak RSS,
+which also counts lxml's C allocations that tracemalloc cannot see.
+
+Run from the backend directory:
+    python -m benchmarks.docx_extraction                 # synthetic 20,000-paragraph file
+    python -m benchmarks.docx_extraction path/to/file.docx
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+import zipfile
+import multiprocessing
+
+import docx
+
+from services.document_processor import DocumentProcessor
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+
+
+def write_synthetic_docx(path: str, paragraphs: int = 20000, table_every: int = 50):
+    """Write a DOCX with many paragraphs and a small fee table every few paragraphs"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', RELS)
+
+        parts = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                 '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                 '<w:body>']
+        for i in range(paragraphs):
+            parts.append(f'<w:p><w:r><w:t>Section {i}: students must submit the form within '
+                         f'{i % 30 + 1} days of the deadline.</w:t></w:r></w:p>')
+            if i % table_every == 0:
+                parts.append(f'<w:tbl><w:tr><w:tc><w:p><w:r><w:t>Late fee {i}</w:t></w:r></w:p></w:tc>'
+                             f'<w:tc><w:p><w:r><w:t>${i % 90 + 10}.00 per week</w:t></w:r></w:p></w:tc>'
+                             '</w:tr></w:tbl>')
+        parts.append('</w:body></w:document>')
+        archive.writestr('word/document.xml', ''.join(parts))
+
+
+def object_model_text(file_path: str) -> str:
+    """The previous extraction path: python-docx body paragraphs only"""
+    doc = docx.Document(file_path)
+    text = ""
+    for paragraph in doc.paragraphs:
+        text += paragraph.text + "\n"
+    return text
+
+
+def streaming_text(file_path: str) -> str:
+    return DocumentProcessor()._extract_from_docx(file_path)
+
+
+# Linux carries a parent's resident size over into a child's ru_maxrss, so the
+# parent stays small: anything large happens in a spawned process
+SPAWN = multiprocessing.get_context('spawn')
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_extraction(extract, file_path: str, results):
+    baseline = peak_rss_mb()  # interpreter plus imports, before any extraction
+    start = time.perf_counter()
+    text = extract(file_path)
+    elapsed = time.perf_counter() - start
+    results.put((elapsed, baseline, peak_rss_mb(), len(text)))
+
+
+def measure(label: str, extract, file_path: str):
+    """Run one extraction path in a fresh process and report its time and peak RSS"""
+    results = SPAWN.Queue()
+    process = SPAWN.Process(target=_run_extraction, args=(extract, file_path, results))
+    process.start()
+    elapsed, baseline, peak, chars = results.get()
+    process.join()
+    print(f"{label:<14} {elapsed:8.3f}s  peak RSS {peak:8.1f} MB  "
+          f"(+{peak - baseline:.1f} MB over imports)  {chars:>10,} chars")
+
+
+def main():
+    if len(sys.argv) > 1:
+        file_path = sys.argv[1]
+    else:
+        file_path = os.path.join(tempfile.mkdtemp(), 'synthetic.docx')
+        writer = SPAWN.Process(target=write_synthetic_docx, args=(file_path,))
+        writer.start()
+        writer.join()
+
+    print(f"📄 {file_path} ({os.path.getsize(file_path) / 1024:.0f} KB)")
+    measure('python-docx', object_model_text, file_path)
+    measure('streaming', streaming_text, file_path)
+
+
+if __name__ == "__main__":
+    main()
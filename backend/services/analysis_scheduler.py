@@ -0,0 +1,227 @@
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# Typical sentence count per document when the caller cannot count them
+DEFAULT_SENTENCES_PER_DOCUMENT = 200
+# Rough file bytes per sentence, for sizing a document from its upload
+BYTES_PER_SENTENCE = 150
+
+
+def estimate_sentence_count(file_size: int = None) -> int:
+    """Estimate a document's sentence count from its file size in bytes"""
+    if file_size is None:
+        return DEFAULT_SENTENCES_PER_DOCUMENT
+    return max(1, file_size // BYTES_PER_SENTENCE)
+
+
+def estimate_analysis_cost(document_count: int, sentence_count: int = None) -> float:
+    """Estimate analysis cost in work units from document and sentence counts
+
+    Every document pair compares sentence against sentence, so the work grows
+    with pairs * (sentences per document) ** 2. One unit is roughly one pair of
+    two 30-sentence documents.
+    """
+    if sentence_count is None:
+        sentence_count = document_count * DEFAULT_SENTENCES_PER_DOCUMENT
+
+    pairs = document_count * (document_count - 1) / 2
+    sentences_per_document = sentence_count / max(document_count, 1)
+    return max(1.0, pairs * sentences_per_document ** 2 / 900)
+
+
+class SchedulerSaturated(Exception):
+    """Raised when an analysis cannot be admitted
+
+    retry_after is a Retry-After hint in seconds, or None when retrying the same
+    request can never succeed.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AnalysisTicket:
+    def __init__(self, session_id: str, cost: float, start_tag: float, finish_tag: float):
+        self.session_id = session_id
+        self.cost = cost
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+
+
+class AnalysisScheduler:
+    """Admission control and weighted fair queueing for analysis requests across sessions
+
+    All queue and budget state lives in this process. When the app runs as
+    several processes, host one instance in the inference server and admit
+    through SharedAnalysisScheduler so the limits hold across all of them.
+    """
+
+    def __init__(self, max_concurrent: int = 2, max_queue_depth: int = 32,
+                 session_max_concurrent: int = 1, session_cost_budget: float = 2000.0,
+                 max_wait_seconds: float = 60.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue_depth = max_queue_depth
+        self.session_max_concurrent = session_max_concurrent
+        self.session_cost_budget = session_cost_budget
+        self.max_wait_seconds = max_wait_seconds
+
+        self._condition = threading.Condition()
+        self._queue = []
+        self._running = 0
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._session_running = defaultdict(int)
+        self._session_cost = defaultdict(float)
+
+        # Monitoring
+        self._seconds_per_cost = 1.0
+        self._recent_waits = deque(maxlen=100)
+        self._admitted = 0
+        self._rejected = 0
+        self._completed = 0
+
+    @contextmanager
+    def admit(self, session_id: str, cost: float, weight: float = 1.0) -> Iterator[AnalysisTicket]:
+        """Queue an analysis, block until it is scheduled, and release its slot afterwards"""
+        ticket = self.acquire(session_id, cost, weight)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def acquire(self, session_id: str, cost: float, weight: float = 1.0) -> AnalysisTicket:
+        """Queue an analysis and block until it is scheduled; release() the ticket when done"""
+        ticket = self._enqueue(session_id, cost, weight)
+        self._wait_for_turn(ticket)
+        return ticket
+
+    def _enqueue(self, session_id: str, cost: float, weight: float) -> AnalysisTicket:
+        with self._condition:
+            if cost > self.session_cost_budget:
+                self._rejected += 1
+                raise SchedulerSaturated(
+                    f'Analysis is too large ({cost:.0f} cost units, limit {self.session_cost_budget:.0f}); '
+                    'analyze fewer or smaller documents'
+                )
+
+            if len(self._queue) >= self.max_queue_depth:
+                self._rejected += 1
+                raise SchedulerSaturated('Analysis queue is full, please retry later',
+                                         self._retry_after())
+
+            session_cost = self._session_cost[session_id]
+            if session_cost + cost > self.session_cost_budget:
+                self._rejected += 1
+                raise SchedulerSaturated('Session analysis budget exceeded, please retry later',
+                                         self._retry_after(session_cost))
+
+            # Weighted fair queueing: sessions advance their own virtual clock by cost / weight
+            start_tag = max(self._virtual_time, self._last_finish.get(session_id, 0.0))
+            finish_tag = start_tag + cost / weight
+            self._last_finish[session_id] = finish_tag
+            self._session_cost[session_id] += cost
+
+            ticket = AnalysisTicket(session_id, cost, start_tag, finish_tag)
+            self._queue.append(ticket)
+            self._admitted += 1
+            self._dispatch()
+            return ticket
+
+    def _wait_for_turn(self, ticket: AnalysisTicket):
+        deadline = ticket.enqueued_at + self.max_wait_seconds
+        with self._condition:
+            while ticket.started_at is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(ticket)
+                    self._forget(ticket)
+                    self._rejected += 1
+                    raise SchedulerSaturated('Timed out waiting for an analysis slot',
+                                             self._retry_after())
+                self._condition.wait(remaining)
+
+    def _dispatch(self):
+        """Start the queued tickets with the smallest finish tags whose sessions have room"""
+        while self._running < self.max_concurrent:
+            eligible = [ticket for ticket in self._queue
+                        if self._session_running[ticket.session_id] < self.session_max_concurrent]
+            if not eligible:
+                break
+
+            ticket = min(eligible, key=lambda t: (t.finish_tag, t.enqueued_at))
+            self._queue.remove(ticket)
+            self._running += 1
+            self._session_running[ticket.session_id] += 1
+            self._virtual_time = max(self._virtual_time, ticket.start_tag)
+
+            ticket.started_at = time.monotonic()
+            self._recent_waits.append(ticket.started_at - ticket.enqueued_at)
+
+        self._condition.notify_all()
+
+    def release(self, ticket: AnalysisTicket):
+        """Free a running ticket's slot and budget"""
+        with self._condition:
+            elapsed = time.monotonic() - ticket.started_at
+            # Smoothed seconds per cost unit feeds the Retry-After estimate
+            self._seconds_per_cost = 0.8 * self._seconds_per_cost + 0.2 * (elapsed / max(ticket.cost, 1.0))
+
+            self._running -= 1
+            self._session_running[ticket.session_id] -= 1
+            self._completed += 1
+            self._forget(ticket)
+            self._dispatch()
+
+    def _forget(self, ticket: AnalysisTicket):
+        """Return a ticket's budget and drop session state once the session is idle"""
+        session_id = ticket.session_id
+        self._session_cost[session_id] -= ticket.cost
+        if not self._session_running[session_id] and not any(
+                queued.session_id == session_id for queued in self._queue):
+            del self._session_cost[session_id]
+            del self._session_running[session_id]
+            if self._last_finish.get(session_id, 0.0) <= self._virtual_time:
+                del self._last_finish[session_id]
+
+    def _retry_after(self, pending_cost: float = None) -> int:
+        """Seconds until enough queued work should have drained"""
+        if pending_cost is None:
+            pending_cost = sum(ticket.cost for ticket in self._queue)
+        return max(1, math.ceil(pending_cost * self._seconds_per_cost / self.max_concurrent))
+
+    def stats(self) -> Dict:
+        """Queue depth, wait times and per-session load for monitoring"""
+        with self._condition:
+            waits = list(self._recent_waits)
+            now = time.monotonic()
+            sessions = {}
+            for session_id, cost in self._session_cost.items():
+                sessions[session_id] = {
+                    'running': self._session_running[session_id],
+                    'queued': sum(1 for t in self._queue if t.session_id == session_id),
+                    'admitted_cost': round(cost, 2)
+                }
+
+            return {
+                'running': self._running,
+                'max_concurrent': self.max_concurrent,
+                'queue_depth': len(self._queue),
+                'max_queue_depth': self.max_queue_depth,
+                'queued_cost': round(sum(t.cost for t in self._queue), 2),
+                'oldest_wait_seconds': round(max((now - t.enqueued_at for t in self._queue), default=0.0), 3),
+                'recent_wait_seconds': {
+                    'average': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    'max': round(max(waits), 3) if waits else 0.0
+                },
+                'admitted': self._admitted,
+                'rejected': self._rejected,
+                'completed': self._completed,
+                'sessions': sessions
+            }
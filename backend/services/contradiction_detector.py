@@ -1,12 +1,18 @@
 import nltk
-import spacy
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator, Callable
+from itertools import islice
 import re
+import threading
 from datetime import datetime
 
+from services.inference_server import InferenceClient, InferenceError
+from services.out_of_core import OutOfCoreAnalyzer
+from services.pair_pool import PairComparisonPool
+from services.sentence_store import SentenceStore
+from services.keyword_matcher import KeywordMatcher
+from config.config import Config
+
 # Download required NLTK data
 try:
     nltk.download('wordnet', quiet=True)
@@ -16,8 +22,101 @@ except:
     pass
 
 class ContradictionDetector:
-    def __init__(self):
-        # Load NLP models
+    # Patterns for different types of numerical data
+    NUMERICAL_PATTERNS = {
+        'time': r'\b(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)?|\d{1,2}\s*(?:AM|PM|am|pm))\b',
+        'percentage': r'\b(\d+(?:\.\d+)?%)\b',
+        'duration_weeks': r'\b(\d+)\s*weeks?\b',
+        'duration_days': r'\b(\d+)\s*days?\b',
+        'attendance': r'attendance[:\s]*(\d+(?:\.\d+)?%)',
+    }
+    
+    # Positive/negative statement patterns for opposite statements
+    CONTRADICTION_PATTERNS = [
+        (r'\bmust\b', r'\bmust not\b|\bforbidden\b|\bprohibited\b'),
+        (r'\brequired\b', r'\boptional\b|\bnot required\b'),
+        (r'\bmandatory\b', r'\bvoluntary\b|\boptional\b'),
+        (r'\ballowed\b', r'\bnot allowed\b|\bforbidden\b')
+    ]
+    
+    POLICY_KEYWORDS = ['policy', 'rule', 'regulation', 'procedure', 'guideline']
+    
+    # Context keywords around numerical values, per numerical pattern
+    CONTEXT_KEYWORDS = {
+        'time': ['submit', 'deadline', 'due', 'close', 'open', 'start', 'end'],
+        'percentage': ['attendance', 'minimum', 'required', 'pass', 'fail'],
+        'duration_weeks': ['notice', 'leave', 'vacation', 'break'],
+        'duration_days': ['notice', 'leave', 'vacation', 'break'],
+        'attendance': ['required', 'minimum', 'mandatory']
+    }
+    
+    # Positive/negative keyword groups for conflicting policies
+    CONTRADICTORY_KEYWORDS = [
+        (['allow', 'permit', 'enable'], ['forbid', 'prohibit', 'disable', 'prevent']),
+        (['require', 'mandatory', 'must'], ['optional', 'voluntary', 'may']),
+        (['include', 'add'], ['exclude', 'remove', 'eliminate']),
+    ]
+    
+    # Whole-word forms the matcher's regular inflections do not produce
+    KEYWORD_FORMS = {
+        'forbid': ['forbade', 'forbidden'],
+        'prohibit': ['prohibition', 'prohibitions'],
+        'prevent': ['prevention'],
+        'permit': ['permission', 'permissible'],
+        'require': ['requirement', 'requirements'],
+        'optional': ['optionally'],
+        'include': ['inclusion'],
+        'exclude': ['exclusion'],
+        'remove': ['removal'],
+        'eliminate': ['elimination'],
+        'add': ['addition'],
+        'submit': ['submission', 'submissions'],
+        'fail': ['failure'],
+    }
+    
+    # Severity score reported by each detector
+    DETECTOR_SEVERITY = {
+        'numerical': 0.9,
+        'policy': 0.85,
+        'semantic': 0.8
+    }
+    
+    def __init__(self, inference_socket: str = None):
+        self._build_keyword_matcher()
+        self.inference_client = None
+        self._pair_pool = None
+        self._pair_pool_lock = threading.Lock()
+        
+        if inference_socket:
+            # Models live in the shared inference server; this instance only forwards requests
+            self.inference_client = InferenceClient(inference_socket)
+            self.nlp = None
+            self.sentence_model = self.inference_client
+            self.contradiction_classifier = self.inference_client.classify
+        else:
+            self._load_models()
+    
+    def _build_keyword_matcher(self):
+        """Compile every keyword list into one matcher and precompute the masks detectors test"""
+        keywords = list(self.POLICY_KEYWORDS)
+        for context_keywords in self.CONTEXT_KEYWORDS.values():
+            keywords.extend(context_keywords)
+        for positive_words, negative_words in self.CONTRADICTORY_KEYWORDS:
+            keywords.extend(positive_words + negative_words)
+        
+        self.keyword_matcher = KeywordMatcher(keywords, self.KEYWORD_FORMS)
+        self._policy_mask = self.keyword_matcher.mask(self.POLICY_KEYWORDS)
+        self._contradictory_masks = [
+            (self.keyword_matcher.mask(positive_words), self.keyword_matcher.mask(negative_words))
+            for positive_words, negative_words in self.CONTRADICTORY_KEYWORDS
+        ]
+    
+    def _load_models(self):
+        """Load NLP models into this process"""
+        import spacy
+        from transformers import pipeline
+        from sentence_transformers import SentenceTransformer
+        
         try:
             self.nlp = spacy.load("en_core_web_sm")
         except OSError:
@@ -34,43 +133,108 @@ class ContradictionDetector:
             return_all_scores=True
         )
     
-    def detect_contradictions(self, documents: Dict[str, str]) -> List[Dict]:
+    def detect_contradictions(self, documents: Dict[str, str], *, max_results: int = None,
+                              min_severity: float = None, workers: int = None,
+                              out_of_core: bool = False, memory_budget_mb: int = None) -> List[Dict]:
         """Main function to detect contradictions between documents"""
-        contradictions = []
+        return list(self.iter_contradictions(
+            documents, max_results=max_results, min_severity=min_severity, workers=workers,
+            out_of_core=out_of_core, memory_budget_mb=memory_budget_mb
+        ))
+    
+    def iter_contradictions(self, documents: Dict[str, str], *, max_results: int = None,
+                            min_severity: float = None, workers: int = None,
+                            out_of_core: bool = False, memory_budget_mb: int = None) -> Iterator[Dict]:
+        """Yield contradictions best-first, each as soon as it is found
+        
+        Every detector reports a single severity, so running the detectors highest
+        severity first over the document pairs (ties keep pair order) finds each
+        contradiction already in its final place.
+        """
+        if max_results is not None and max_results <= 0:
+            return
+        
+        if out_of_core:
+            # Findings stream straight off disk-backed intermediates in final order
+            yield from OutOfCoreAnalyzer(self, memory_budget_mb).iter_detect(
+                documents, max_results, min_severity
+            )
+            return
         
         # Extract sentences from all documents
-        doc_sentences = {}
+        store = SentenceStore()
         for doc_name, text in documents.items():
-            sentences = self._extract_sentences(text)
-            doc_sentences[doc_name] = sentences
+            store.add_document(doc_name, self._extract_sentences(text), self.keyword_matcher.scan)
+        store.seal()
         
-        # Compare sentences across documents
-        doc_names = list(doc_sentences.keys())
+        doc_count = store.document_count
+        pairs = [(i, j) for i in range(doc_count) for j in range(i + 1, doc_count)]
         
-        for i in range(len(doc_names)):
-            for j in range(i + 1, len(doc_names)):
-                doc1, doc2 = doc_names[i], doc_names[j]
-                doc_contradictions = self._compare_documents(
-                    doc1, doc_sentences[doc1],
-                    doc2, doc_sentences[doc2]
-                )
-                contradictions.extend(doc_contradictions)
+        detectors = self._detectors_by_severity()
+        if min_severity is not None:
+            detectors = [(severity, detect) for severity, detect in detectors if severity >= min_severity]
         
-        # Sort by severity score
-        contradictions.sort(key=lambda x: x['severity_score'], reverse=True)
+        # One work unit per (detector, pair), in the order findings are reported
+        units = [(detect, doc1, doc2) for _, detect in detectors for doc1, doc2 in pairs]
         
-        return contradictions
+        workers = workers or Config.ANALYSIS_WORKERS
+        shared = None
+        if workers > 1 and len(units) > 1 and PairComparisonPool.available():
+            pool = self._pair_comparison_pool(workers)
+            shared = pool.share(store)
+            unit_results = pool.map(shared, [(detect.__name__, doc1, doc2) for detect, doc1, doc2 in units])
+        else:
+            unit_results = (detect(store, doc1, doc2) for detect, doc1, doc2 in units)
+        
+        findings = (store.resolve(contradiction) for found in unit_results for contradiction in found)
+        try:
+            yield from islice(findings, max_results)
+        finally:
+            # Cancels the work units still queued once enough results are out
+            unit_results.close()
+            if shared:
+                shared.release()
+    
+    def _pair_comparison_pool(self, workers: int) -> PairComparisonPool:
+        """The worker pool, forked on first use and kept for later analyses"""
+        with self._pair_pool_lock:
+            if self._pair_pool is None:
+                self._pair_pool = PairComparisonPool(self, workers)
+            return self._pair_pool
+    
+    def close(self):
+        """Shut down the pair-comparison worker pool, if one was started"""
+        with self._pair_pool_lock:
+            if self._pair_pool is not None:
+                self._pair_pool.close()
+                self._pair_pool = None
+    
+    def _detectors_by_severity(self) -> List[Tuple[float, Callable]]:
+        """Pair each detector with the severity of the findings it reports, highest first"""
+        detectors = [
+            (self.DETECTOR_SEVERITY['numerical'], self._detect_numerical_contradictions),
+            (self.DETECTOR_SEVERITY['policy'], self._detect_policy_contradictions),
+            (self.DETECTOR_SEVERITY['semantic'], self._detect_semantic_contradictions),
+        ]
+        return sorted(detectors, key=lambda detector: detector[0], reverse=True)
     
     def _extract_sentences(self, text: str) -> List[str]:
         """Extract meaningful sentences from text"""
-        if not self.nlp:
+        return self._filter_sentences(self._split_sentences(text))
+    
+    def _split_sentences(self, text: str) -> List[str]:
+        """Split text into raw sentences, before any filtering"""
+        if self.inference_client:
+            return self.inference_client.split_sentences([text])[0]
+        elif not self.nlp:
             # Fallback to simple sentence splitting
-            sentences = re.split(r'[.!?]+', text)
+            return re.split(r'[.!?]+', text)
         else:
             doc = self.nlp(text)
-            sentences = [sent.text.strip() for sent in doc.sents]
-        
-        # Filter sentences
+            return [sent.text.strip() for sent in doc.sents]
+    
+    def _filter_sentences(self, sentences: List[str]) -> List[str]:
+        """Keep the sentences long enough to compare"""
         filtered_sentences = []
         for sentence in sentences:
             if len(sentence) > 20 and not sentence.isdigit():
@@ -78,116 +242,105 @@ class ContradictionDetector:
         
         return filtered_sentences
     
-    def _compare_documents(self, doc1_name: str, doc1_sentences: List[str], 
-                          doc2_name: str, doc2_sentences: List[str]) -> List[Dict]:
-        """Compare sentences between two documents"""
-        contradictions = []
-        
-        # Check for numerical contradictions
-        numerical_contradictions = self._detect_numerical_contradictions(
-            doc1_name, doc1_sentences, doc2_name, doc2_sentences
-        )
-        contradictions.extend(numerical_contradictions)
-        
-        # Check for semantic contradictions
-        semantic_contradictions = self._detect_semantic_contradictions(
-            doc1_name, doc1_sentences, doc2_name, doc2_sentences
-        )
-        contradictions.extend(semantic_contradictions)
-        
-        # Check for policy contradictions
-        policy_contradictions = self._detect_policy_contradictions(
-            doc1_name, doc1_sentences, doc2_name, doc2_sentences
-        )
-        contradictions.extend(policy_contradictions)
-        
-        return contradictions
-    
-    def _detect_numerical_contradictions(self, doc1_name: str, doc1_sentences: List[str],
-                                       doc2_name: str, doc2_sentences: List[str]) -> List[Dict]:
+    def _detect_numerical_contradictions(self, store: SentenceStore, doc1: int, doc2: int) -> List[Dict]:
         """Detect numerical contradictions (times, percentages, durations)"""
         contradictions = []
         
-        # Patterns for different types of numerical data
-        patterns = {
-            'time': r'\b(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)?|\d{1,2}\s*(?:AM|PM|am|pm))\b',
-            'percentage': r'\b(\d+(?:\.\d+)?%)\b',
-            'duration_weeks': r'\b(\d+)\s*weeks?\b',
-            'duration_days': r'\b(\d+)\s*days?\b',
-            'attendance': r'attendance[:\s]*(\d+(?:\.\d+)?%)',
-        }
+        pattern_matches = []
+        for pattern_name, pattern in self.NUMERICAL_PATTERNS.items():
+            doc1_matches = self._extract_numerical_contexts(store, doc1, pattern, pattern_name)
+            doc2_matches = self._extract_numerical_contexts(store, doc2, pattern, pattern_name)
+            if doc1_matches and doc2_matches:
+                pattern_matches.append((pattern_name, doc1_matches, doc2_matches))
         
-        for pattern_name, pattern in patterns.items():
-            doc1_matches = self._extract_numerical_contexts(doc1_sentences, pattern, pattern_name)
-            doc2_matches = self._extract_numerical_contexts(doc2_sentences, pattern, pattern_name)
-            
+        # One embedding call for every context this pair compares
+        embeddings = self._embed_texts(context for _, doc1_matches, doc2_matches in pattern_matches
+                                       for context, _, _ in doc1_matches + doc2_matches)
+        
+        for pattern_name, doc1_matches, doc2_matches in pattern_matches:
             # Compare matches
             for context1, value1, sentence1 in doc1_matches:
                 for context2, value2, sentence2 in doc2_matches:
-                    similarity = self._calculate_context_similarity(context1, context2)
+                    similarity = self._calculate_context_similarity(context1, context2, embeddings)
                     
                     if similarity > 0.7 and value1 != value2:  # Same context, different values
-                        contradictions.append({
-                            'type': 'numerical',
-                            'subtype': pattern_name,
-                            'document1': doc1_name,
-                            'document2': doc2_name,
-                            'sentence1': sentence1,
-                            'sentence2': sentence2,
-                            'value1': value1,
-                            'value2': value2,
-                            'context_similarity': similarity,
-                            'severity_score': 0.9,
-                            'description': f"Conflicting {pattern_name} values: {value1} vs {value2}",
-                            'suggestion': f"Clarify which {pattern_name} value is correct: {value1} or {value2}"
-                        })
+                        contradictions.append(self._numerical_contradiction(
+                            pattern_name, doc1, doc2, sentence1, sentence2,
+                            value1, value2, similarity
+                        ))
         
         return contradictions
     
-    def _extract_numerical_contexts(self, sentences: List[str], pattern: str, pattern_type: str) -> List[Tuple]:
-        """Extract numerical values with their contexts"""
+    def _numerical_contradiction(self, pattern_name: str, document1, document2,
+                                 sentence1, sentence2, value1: str, value2: str,
+                                 similarity: float) -> Dict:
+        """Build a numerical contradiction finding from store IDs or resolved names and text"""
+        return {
+            'type': 'numerical',
+            'subtype': pattern_name,
+            'document1': document1,
+            'document2': document2,
+            'sentence1': sentence1,
+            'sentence2': sentence2,
+            'value1': value1,
+            'value2': value2,
+            'context_similarity': similarity,
+            'severity_score': self.DETECTOR_SEVERITY['numerical'],
+            'description': f"Conflicting {pattern_name} values: {value1} vs {value2}",
+            'suggestion': f"Clarify which {pattern_name} value is correct: {value1} or {value2}"
+        }
+    
+    def _extract_numerical_contexts(self, store: SentenceStore, doc_id: int, pattern: str,
+                                    pattern_type: str) -> List[Tuple]:
+        """Extract numerical values with their contexts and sentence IDs"""
         matches = []
-        for sentence in sentences:
+        for sentence_id in store.document_sentences(doc_id):
+            sentence = store.text(sentence_id)
             found_values = re.findall(pattern, sentence, re.IGNORECASE)
             if found_values:
                 # Extract context around the number
-                context = self._extract_context(sentence, pattern_type)
+                context = self._extract_context(sentence, pattern_type, store.keywords(sentence_id))
                 for value in found_values:
-                    matches.append((context, value, sentence))
+                    matches.append((context, value, sentence_id))
         return matches
     
-    def _extract_context(self, sentence: str, pattern_type: str) -> str:
+    def _extract_context(self, sentence: str, pattern_type: str, keywords: int = None) -> str:
         """Extract context keywords around numerical values"""
-        context_keywords = {
-            'time': ['submit', 'deadline', 'due', 'close', 'open', 'start', 'end'],
-            'percentage': ['attendance', 'minimum', 'required', 'pass', 'fail'],
-            'duration_weeks': ['notice', 'leave', 'vacation', 'break'],
-            'duration_days': ['notice', 'leave', 'vacation', 'break'],
-            'attendance': ['required', 'minimum', 'mandatory']
-        }
+        if keywords is None:
+            keywords = self.keyword_matcher.scan(sentence)
         
-        keywords = context_keywords.get(pattern_type, [])
-        found_keywords = []
-        
-        sentence_lower = sentence.lower()
-        for keyword in keywords:
-            if keyword in sentence_lower:
-                found_keywords.append(keyword)
+        found_keywords = self.keyword_matcher.present(keywords, self.CONTEXT_KEYWORDS.get(pattern_type, []))
         
         return ' '.join(found_keywords) if found_keywords else sentence[:50]
     
-    def _calculate_context_similarity(self, context1: str, context2: str) -> float:
-        """Calculate similarity between two contexts"""
+    def _embed_texts(self, texts) -> Dict[str, np.ndarray]:
+        """Embed the distinct non-empty texts in one model call; empty if the local model fails"""
+        unique_texts = list(dict.fromkeys(text for text in texts if text))
+        if not unique_texts:
+            return {}
+        
+        try:
+            vectors = self.sentence_model.encode(unique_texts)
+        except InferenceError:
+            # A failing inference server must surface, not quietly change the findings
+            raise
+        except Exception:
+            return {}
+        return dict(zip(unique_texts, vectors))
+    
+    def _calculate_context_similarity(self, context1: str, context2: str,
+                                      embeddings: Dict[str, np.ndarray] = None) -> float:
+        """Calculate similarity between two contexts, using precomputed embeddings when given"""
         if not context1 or not context2:
             return 0.0
         
-        try:
-            embeddings = self.sentence_model.encode([context1, context2])
-            similarity = np.dot(embeddings[0], embeddings[1]) / (
-                np.linalg.norm(embeddings[0]) * np.linalg.norm(embeddings[1])
-            )
-            return float(similarity)
-        except:
+        if embeddings is None:
+            embeddings = self._embed_texts([context1, context2])
+        
+        vector1, vector2 = embeddings.get(context1), embeddings.get(context2)
+        if vector1 is not None and vector2 is not None:
+            return self._cosine_similarity(vector1, vector2)
+        else:
             # Fallback to simple word overlap
             words1 = set(context1.lower().split())
             words2 = set(context2.lower().split())
@@ -196,102 +349,133 @@ class ContradictionDetector:
             overlap = len(words1.intersection(words2))
             return overlap / max(len(words1), len(words2))
     
-    def _detect_semantic_contradictions(self, doc1_name: str, doc1_sentences: List[str],
-                                     doc2_name: str, doc2_sentences: List[str]) -> List[Dict]:
+    @staticmethod
+    def _cosine_similarity(vector1: np.ndarray, vector2: np.ndarray) -> float:
+        """Cosine similarity of two embeddings; the out-of-core path scores with this too"""
+        similarity = np.dot(vector1, vector2) / (
+            np.linalg.norm(vector1) * np.linalg.norm(vector2)
+        )
+        return float(similarity)
+    
+    def _detect_semantic_contradictions(self, store: SentenceStore, doc1: int, doc2: int) -> List[Dict]:
         """Detect semantic contradictions using NLP"""
         contradictions = []
         
+        sentences = [(sentence_id, store.text(sentence_id))
+                     for doc_id in (doc1, doc2) for sentence_id in store.document_sentences(doc_id)]
+        
         # Look for opposite statements
-        contradiction_patterns = [
-            (r'\bmust\b', r'\bmust not\b|\bforbidden\b|\bprohibited\b'),
-            (r'\brequired\b', r'\boptional\b|\bnot required\b'),
-            (r'\bmandatory\b', r'\bvoluntary\b|\boptional\b'),
-            (r'\ballowed\b', r'\bnot allowed\b|\bforbidden\b')
-        ]
+        pattern_matches = []
+        for positive_pattern, negative_pattern in self.CONTRADICTION_PATTERNS:
+            positive_sentences = [(i, s) for i, s in sentences
+                                  if re.search(positive_pattern, s, re.IGNORECASE)]
+            negative_sentences = [(i, s) for i, s in sentences
+                                  if re.search(negative_pattern, s, re.IGNORECASE)]
+            if positive_sentences and negative_sentences:
+                pattern_matches.append((positive_sentences, negative_sentences))
         
-        for positive_pattern, negative_pattern in contradiction_patterns:
-            positive_sentences = [s for s in doc1_sentences + doc2_sentences 
-                                if re.search(positive_pattern, s, re.IGNORECASE)]
-            negative_sentences = [s for s in doc1_sentences + doc2_sentences 
-                                if re.search(negative_pattern, s, re.IGNORECASE)]
-            
-            for pos_sent in positive_sentences:
-                for neg_sent in negative_sentences:
+        embeddings = self._embed_texts(s for positive_sentences, negative_sentences in pattern_matches
+                                       for _, s in positive_sentences + negative_sentences)
+        
+        for positive_sentences, negative_sentences in pattern_matches:
+            for pos_id, pos_sent in positive_sentences:
+                for neg_id, neg_sent in negative_sentences:
                     # Check if they refer to similar topics
-                    similarity = self._calculate_context_similarity(pos_sent, neg_sent)
+                    similarity = self._calculate_context_similarity(pos_sent, neg_sent, embeddings)
                     if similarity > 0.6:
-                        doc1_has_pos = pos_sent in doc1_sentences
-                        doc1_has_neg = neg_sent in doc1_sentences
+                        doc1_has_pos = store.contains(doc1, pos_id)
+                        doc1_has_neg = store.contains(doc1, neg_id)
                         
                         if (doc1_has_pos and not doc1_has_neg) or (not doc1_has_pos and doc1_has_neg):
-                            contradictions.append({
-                                'type': 'semantic',
-                                'subtype': 'opposite_statements',
-                                'document1': doc1_name if doc1_has_pos else doc2_name,
-                                'document2': doc2_name if doc1_has_pos else doc1_name,
-                                'sentence1': pos_sent,
-                                'sentence2': neg_sent,
-                                'similarity': similarity,
-                                'severity_score': 0.8,
-                                'description': 'Documents contain opposite statements about the same topic',
-                                'suggestion': 'Review and align the conflicting statements'
-                            })
+                            contradictions.append(self._semantic_contradiction(
+                                doc1 if doc1_has_pos else doc2,
+                                doc2 if doc1_has_pos else doc1,
+                                pos_id, neg_id, similarity
+                            ))
         
         return contradictions
     
-    def _detect_policy_contradictions(self, doc1_name: str, doc1_sentences: List[str],
-                                    doc2_name: str, doc2_sentences: List[str]) -> List[Dict]:
+    def _semantic_contradiction(self, document1, document2, sentence1, sentence2,
+                                similarity: float) -> Dict:
+        """Build an opposite-statement contradiction finding"""
+        return {
+            'type': 'semantic',
+            'subtype': 'opposite_statements',
+            'document1': document1,
+            'document2': document2,
+            'sentence1': sentence1,
+            'sentence2': sentence2,
+            'similarity': similarity,
+            'severity_score': self.DETECTOR_SEVERITY['semantic'],
+            'description': 'Documents contain opposite statements about the same topic',
+            'suggestion': 'Review and align the conflicting statements'
+        }
+    
+    def _detect_policy_contradictions(self, store: SentenceStore, doc1: int, doc2: int) -> List[Dict]:
         """Detect policy-level contradictions"""
         contradictions = []
         
         # Extract policy statements
-        policy_keywords = ['policy', 'rule', 'regulation', 'procedure', 'guideline']
+        doc1_policies = [(i, store.text(i)) for i in store.document_sentences(doc1)
+                         if store.keywords(i) & self._policy_mask]
+        doc2_policies = [(i, store.text(i)) for i in store.document_sentences(doc2)
+                         if store.keywords(i) & self._policy_mask]
         
-        doc1_policies = [s for s in doc1_sentences 
-                        if any(keyword in s.lower() for keyword in policy_keywords)]
-        doc2_policies = [s for s in doc2_sentences 
-                        if any(keyword in s.lower() for keyword in policy_keywords)]
+        embeddings = {}
+        if doc1_policies and doc2_policies:
+            embeddings = self._embed_texts(policy for _, policy in doc1_policies + doc2_policies)
         
         # Compare policy statements
-        for policy1 in doc1_policies:
-            for policy2 in doc2_policies:
-                similarity = self._calculate_context_similarity(policy1, policy2)
+        for policy1_id, policy1 in doc1_policies:
+            for policy2_id, policy2 in doc2_policies:
+                similarity = self._calculate_context_similarity(policy1, policy2, embeddings)
                 
                 if similarity > 0.7:  # Similar policy topics
                     # Check if they contradict each other
-                    if self._are_policies_contradictory(policy1, policy2):
-                        contradictions.append({
-                            'type': 'policy',
-                            'subtype': 'conflicting_policies',
-                            'document1': doc1_name,
-                            'document2': doc2_name,
-                            'sentence1': policy1,
-                            'sentence2': policy2,
-                            'similarity': similarity,
-                            'severity_score': 0.85,
-                            'description': 'Conflicting policy statements found',
-                            'suggestion': 'Harmonize the conflicting policies'
-                        })
+                    if self._are_policies_contradictory(policy1, policy2, store.keywords(policy1_id),
+                                                        store.keywords(policy2_id)):
+                        contradictions.append(self._policy_contradiction(
+                            doc1, doc2, policy1_id, policy2_id, similarity
+                        ))
         
         return contradictions
     
-    def _are_policies_contradictory(self, policy1: str, policy2: str) -> bool:
+    def _policy_contradiction(self, document1, document2, policy1, policy2,
+                              similarity: float) -> Dict:
+        """Build a conflicting-policy contradiction finding"""
+        return {
+            'type': 'policy',
+            'subtype': 'conflicting_policies',
+            'document1': document1,
+            'document2': document2,
+            'sentence1': policy1,
+            'sentence2': policy2,
+            'similarity': similarity,
+            'severity_score': self.DETECTOR_SEVERITY['policy'],
+            'description': 'Conflicting policy statements found',
+            'suggestion': 'Harmonize the conflicting policies'
+        }
+    
+    def _is_policy_statement(self, sentence: str, keywords: int = None) -> bool:
+        """Check whether a sentence states a policy"""
+        if keywords is None:
+            keywords = self.keyword_matcher.scan(sentence)
+        return bool(keywords & self._policy_mask)
+    
+    def _are_policies_contradictory(self, policy1: str, policy2: str,
+                                    keywords1: int = None, keywords2: int = None) -> bool:
         """Check if two policy statements are contradictory"""
         # Simple contradiction detection based on keywords
-        contradictory_pairs = [
-            (['allow', 'permit', 'enable'], ['forbid', 'prohibit', 'disable', 'prevent']),
-            (['require', 'mandatory', 'must'], ['optional', 'voluntary', 'may']),
-            (['include', 'add'], ['exclude', 'remove', 'eliminate']),
-        ]
-        
-        policy1_lower = policy1.lower()
-        policy2_lower = policy2.lower()
+        if keywords1 is None:
+            keywords1 = self.keyword_matcher.scan(policy1)
+        if keywords2 is None:
+            keywords2 = self.keyword_matcher.scan(policy2)
         
-        for positive_words, negative_words in contradictory_pairs:
-            has_positive1 = any(word in policy1_lower for word in positive_words)
-            has_negative1 = any(word in policy1_lower for word in negative_words)
-            has_positive2 = any(word in policy2_lower for word in positive_words)
-            has_negative2 = any(word in policy2_lower for word in negative_words)
+        for positive_mask, negative_mask in self._contradictory_masks:
+            has_positive1 = keywords1 & positive_mask
+            has_negative1 = keywords1 & negative_mask
+            has_positive2 = keywords2 & positive_mask
+            has_negative2 = keywords2 & negative_mask
             
             if (has_positive1 and has_negative2) or (has_negative1 and has_positive2):
                 return True
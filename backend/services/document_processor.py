@@ -1,8 +1,22 @@
 import PyPDF2
-import docx
 import os
 import re
-from typing import List, Dict, Any
+import zipfile
+from xml.etree.ElementTree import iterparse
+from typing import List, Dict, Any, Iterator
+
+# WordprocessingML element names
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY = W_NS + 'body'
+W_P = W_NS + 'p'
+W_R = W_NS + 'r'
+W_T = W_NS + 't'
+W_TAB = W_NS + 'tab'
+W_BR = W_NS + 'br'
+W_CR = W_NS + 'cr'
+W_TR = W_NS + 'tr'
+W_TC = W_NS + 'tc'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
 
 class DocumentProcessor:
     def __init__(self):
@@ -34,16 +48,94 @@ class DocumentProcessor:
         return text
     
     def _extract_from_docx(self, file_path: str) -> str:
-        """Extract text from DOCX file"""
+        """Extract text from DOCX file, including tables"""
         try:
-            doc = docx.Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            return ''.join(block + "\n" for block in self.iter_docx_text(file_path))
         except Exception as e:
             raise Exception(f"Error reading DOCX: {str(e)}")
     
+    def iter_docx_text(self, file_path: str) -> Iterator[str]:
+        """Stream paragraph and table-row text out of word/document.xml in document order
+
+        Table rows come out as one line of tab-separated cells; nested tables and
+        text boxes are folded into the cell or paragraph that contains them.
+        """
+        with zipfile.ZipFile(file_path) as archive:
+            with archive.open('word/document.xml') as xml_file:
+                body = None
+                # Open paragraphs, cells and rows as (tag, parts, nested blocks, enclosing runs)
+                frames = []
+                run_depth = 0       # w:tab also defines tab stops in w:pPr; only runs carry text
+                fallback_depth = 0  # mc:Fallback repeats its mc:Choice (e.g. a text box as VML)
+                
+                for event, elem in iterparse(xml_file, events=('start', 'end')):
+                    tag = elem.tag
+                    
+                    if tag == MC_FALLBACK:
+                        fallback_depth += 1 if event == 'start' else -1
+                        continue
+                    if fallback_depth:
+                        continue
+                    
+                    if event == 'start':
+                        if tag in (W_P, W_TC, W_TR):
+                            frames.append((tag, [], [], run_depth))
+                        elif tag == W_R:
+                            run_depth += 1
+                        elif tag == W_BODY:
+                            body = elem
+                        continue
+                    
+                    paragraph = None
+                    in_run = False
+                    if frames and frames[-1][0] == W_P:
+                        paragraph = frames[-1][1]
+                        # A text box sits inside its host's run; count only its own runs
+                        in_run = run_depth > frames[-1][3]
+                    finished = []
+                    
+                    if tag == W_T:
+                        if paragraph is not None and elem.text:
+                            paragraph.append(elem.text)
+                    elif tag == W_R:
+                        run_depth -= 1
+                    elif tag == W_TAB:
+                        if paragraph is not None and in_run:
+                            paragraph.append('\t')
+                    elif tag in (W_BR, W_CR):
+                        if paragraph is not None and in_run:
+                            paragraph.append('\n')
+                    elif tag == W_P:
+                        _, parts, nested, _ = frames.pop()
+                        # Text boxes close inside their host paragraph but read after it
+                        finished = [''.join(parts)] + nested
+                    elif tag == W_TC:
+                        _, blocks, _, _ = frames.pop()
+                        cell = ' '.join(block.strip() for block in blocks if block.strip())
+                        if frames and frames[-1][0] == W_TR:
+                            frames[-1][1].append(cell)
+                        elif cell:
+                            finished = [cell]
+                    elif tag == W_TR:
+                        _, cells, _, _ = frames.pop()
+                        row = '\t'.join(cells)
+                        if row.strip():
+                            finished = [row]
+                    
+                    for block in finished:
+                        if not frames:
+                            yield block
+                        elif frames[-1][0] == W_P:
+                            frames[-1][2].append(block)
+                        else:
+                            frames[-1][1].append(block)
+                    
+                    # Drop finished subtrees so memory stays flat on large files and tables
+                    if tag in (W_P, W_TC, W_TR):
+                        elem.clear()
+                    if body is not None and len(body) and body[-1] is elem:
+                        body.clear()
+    
     def _extract_from_txt(self, file_path: str) -> str:
         """Extract text from TXT file"""
         try:
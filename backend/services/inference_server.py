@@ -0,0 +1,317 @@
+import os
+import re
+import queue
+import secrets
+import socket
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing.connection import Listener, Client
+from multiprocessing import AuthenticationError
+from typing import List, Dict, Any, Iterator
+
+import numpy as np
+
+from config.config import Config
+from services.analysis_scheduler import AnalysisScheduler, SchedulerSaturated
+
+# Answered on the connection's own thread instead of going through the batch loop
+SCHEDULER_OPS = ('admit', 'release', 'scheduler_stats')
+
+
+class InferenceError(RuntimeError):
+    """The inference server is unreachable or failed to run a request"""
+
+
+def private_runtime_dir() -> str:
+    """Create (0700) and return the per-user directory for the default socket and generated key"""
+    path = Config.INFERENCE_RUNTIME_DIR
+    os.makedirs(path, mode=0o700, exist_ok=True)
+
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by and private to the current user")
+    return path
+
+
+def inference_authkey() -> bytes:
+    """Key shared by the server and its clients: INFERENCE_AUTHKEY, else one generated per install"""
+    if Config.INFERENCE_AUTHKEY:
+        return Config.INFERENCE_AUTHKEY.encode()
+
+    key_path = os.path.join(private_runtime_dir(), 'inference.key')
+    if not os.path.exists(key_path):
+        # Write the key to a 0600 temp file and link it into place, so a concurrent
+        # reader never sees a half-written key and the first process to start wins
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(key_path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(secrets.token_hex(32).encode())
+            os.link(temp_path, key_path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(temp_path)
+
+    with open(key_path, 'rb') as f:
+        return f.read()
+
+
+class InferenceServer:
+    """Owns the NLP models and serves batched inference to web workers over a Unix socket
+
+    It also hosts the one AnalysisScheduler that every web worker process
+    admits analyses through (see SharedAnalysisScheduler).
+    """
+
+    def __init__(self, socket_path: str = None, max_batch_size: int = 64):
+        self.socket_path = socket_path or Config.INFERENCE_SOCKET
+        self.max_batch_size = max_batch_size
+        self.requests = queue.Queue()
+        self.scheduler = AnalysisScheduler()
+        self.nlp = None
+        self.sentence_model = None
+        self.contradiction_classifier = None
+
+    def load_models(self):
+        """Load the models once; every connected worker shares this copy"""
+        from services.contradiction_detector import ContradictionDetector
+
+        detector = ContradictionDetector()
+        self.nlp = detector.nlp
+        self.sentence_model = detector.sentence_model
+        self.contradiction_classifier = detector.contradiction_classifier
+
+    def serve_forever(self):
+        """Accept worker connections and answer their requests until killed"""
+        self.load_models()
+        authkey = inference_authkey()
+
+        if os.path.dirname(self.socket_path) == Config.INFERENCE_RUNTIME_DIR:
+            private_runtime_dir()
+        if os.path.exists(self.socket_path):
+            if self._socket_in_use():
+                raise RuntimeError(f"Another inference server is already listening on {self.socket_path}")
+            # Left behind by a server that is no longer running
+            os.unlink(self.socket_path)
+
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+
+        with Listener(self.socket_path, family='AF_UNIX', authkey=authkey) as listener:
+            os.chmod(self.socket_path, 0o600)
+            print(f"Inference server listening on {self.socket_path}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    print(f"Inference connection rejected: {e}")
+                    continue
+                threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+
+    def _socket_in_use(self) -> bool:
+        """Whether a live server still answers on the socket path"""
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+            return True
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        finally:
+            probe.close()
+
+    def _handle_connection(self, conn):
+        """Queue each request from one worker and send back its slice of the batch result"""
+        tickets = {}
+        try:
+            while True:
+                op, payload = conn.recv()
+                if op in SCHEDULER_OPS:
+                    conn.send(self._schedule(op, payload, tickets))
+                    continue
+
+                pending = {
+                    'op': op,
+                    'texts': list(payload),
+                    'done': threading.Event(),
+                    'result': None,
+                    'error': None
+                }
+                self.requests.put(pending)
+                pending['done'].wait()
+                conn.send((pending['error'], pending['result']))
+        except (EOFError, OSError):
+            pass
+        finally:
+            # A worker that died mid-analysis must not hold its slot forever
+            for ticket in tickets.values():
+                self.scheduler.release(ticket)
+            conn.close()
+
+    def _schedule(self, op: str, payload: Any, tickets: Dict) -> tuple:
+        """Run one scheduler operation for a connection that owns the given tickets"""
+        try:
+            if op == 'admit':
+                session_id, cost, weight = payload
+                try:
+                    ticket = self.scheduler.acquire(session_id, cost, weight)
+                except SchedulerSaturated as e:
+                    return None, {'saturated': str(e), 'retry_after': e.retry_after}
+                tickets[id(ticket)] = ticket
+                return None, {'ticket': id(ticket)}
+            elif op == 'release':
+                ticket = tickets.pop(payload, None)
+                if ticket:
+                    self.scheduler.release(ticket)
+                return None, None
+            else:
+                return None, self.scheduler.stats()
+        except Exception as e:
+            return str(e), None
+
+    def _batch_loop(self):
+        """Run whatever requests are queued together; the next batch forms while this one runs"""
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0]['texts'])
+
+            # Never wait for more work: an idle server answers a lone request at once
+            while size < self.max_batch_size:
+                try:
+                    pending = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                size += len(pending['texts'])
+
+            by_op = {}
+            for pending in batch:
+                by_op.setdefault(pending['op'], []).append(pending)
+
+            for op, group in by_op.items():
+                self._run_batch(op, group)
+
+    def _run_batch(self, op: str, group: List[Dict]):
+        """Run one forward pass for a group of requests and split the output back up"""
+        texts = [text for pending in group for text in pending['texts']]
+
+        try:
+            results = self._infer(op, texts)
+        except Exception as e:
+            for pending in group:
+                pending['error'] = str(e)
+                pending['done'].set()
+            return
+
+        offset = 0
+        for pending in group:
+            count = len(pending['texts'])
+            pending['result'] = results[offset:offset + count]
+            offset += count
+            pending['done'].set()
+
+    def _infer(self, op: str, texts: List[str]) -> Any:
+        """Dispatch a batch of texts to the model that handles the given operation"""
+        if not texts:
+            return []
+
+        if op == 'embed':
+            return self.sentence_model.encode(texts, batch_size=self.max_batch_size)
+        elif op == 'classify':
+            return self.contradiction_classifier(texts)
+        elif op == 'sentences':
+            if not self.nlp:
+                # Same fallback ContradictionDetector uses without spaCy
+                return [re.split(r'[.!?]+', text) for text in texts]
+            return [[sent.text.strip() for sent in doc.sents] for doc in self.nlp.pipe(texts)]
+        else:
+            raise ValueError(f"Unsupported inference operation: {op}")
+
+
+class InferenceClient:
+    """Thin client that forwards inference calls to a running InferenceServer
+
+    Each thread gets its own connection, so concurrent request threads reach
+    the server together and land in the same batch.
+    """
+
+    def __init__(self, socket_path: str = None):
+        self.socket_path = socket_path or Config.INFERENCE_SOCKET
+        self._local = threading.local()
+
+    def reset_after_fork(self):
+        """Drop the connection state copied from the parent process"""
+        self._local = threading.local()
+
+    def _connection(self):
+        # Reconnect after a fork so pre-forked workers never share one socket
+        local = self._local
+        if getattr(local, 'conn', None) is None or local.pid != os.getpid():
+            local.conn = Client(self.socket_path, family='AF_UNIX', authkey=inference_authkey())
+            local.pid = os.getpid()
+        return local.conn
+
+    def _call(self, op: str, texts: List[str]) -> Any:
+        """Send one request to the server and wait for its result"""
+        if not texts:
+            return []
+        return self._request(op, list(texts))
+
+    def _request(self, op: str, payload: Any) -> Any:
+        """Send one message to the server and wait for its reply"""
+        try:
+            conn = self._connection()
+            conn.send((op, payload))
+            error, result = conn.recv()
+        except (EOFError, OSError, AuthenticationError) as e:
+            self._local.conn = None
+            raise InferenceError(f"Inference server unavailable at {self.socket_path}: {e}") from e
+
+        if error:
+            raise InferenceError(f"Inference server error: {error}")
+        return result
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        """Embed texts; mirrors SentenceTransformer.encode for list input"""
+        return np.asarray(self._call('embed', texts))
+
+    def classify(self, texts: List[str]) -> List:
+        """Run the text-classification pipeline on texts"""
+        return self._call('classify', texts)
+
+    def split_sentences(self, texts: List[str]) -> List[List[str]]:
+        """Split each text into raw sentences with the server's spaCy model"""
+        return self._call('sentences', texts)
+
+
+class SharedAnalysisScheduler:
+    """AnalysisScheduler interface backed by the one scheduler in the inference server
+
+    Every web worker process admits through the same queue, so concurrency,
+    queue depth and session budgets hold across the whole deployment. A ticket
+    is released when its analysis ends or when the worker's connection drops.
+    """
+
+    def __init__(self, socket_path: str = None):
+        self.client = InferenceClient(socket_path)
+
+    @contextmanager
+    def admit(self, session_id: str, cost: float, weight: float = 1.0) -> Iterator[int]:
+        """Queue an analysis on the server, block until it is scheduled, and release it afterwards"""
+        admission = self.client._request('admit', (session_id, cost, weight))
+        if 'saturated' in admission:
+            raise SchedulerSaturated(admission['saturated'], admission['retry_after'])
+
+        try:
+            yield admission['ticket']
+        finally:
+            self.client._request('release', admission['ticket'])
+
+    def stats(self) -> Dict:
+        """The shared scheduler's monitoring stats"""
+        return self.client._request('scheduler_stats', None)
+
+
+if __name__ == "__main__":
+    print("🧠 Smart Doc Checker inference server starting...")
+    InferenceServer().serve_forever()
@@ -0,0 +1,71 @@
+import re
+from typing import Dict, List, Iterable, Set
+
+
+class KeywordMatcher:
+    """Precompiled single-pass keyword matcher that turns a sentence into a keyword bitset
+
+    Every accepted word form is listed up front in a form -> bits table, so a
+    sentence is lowercased and tokenized once and each token is one dict lookup.
+    A keyword matches only whole words: itself, its regular inflections
+    (allow/allows/allowed/allowing, close/closing, submit/submitted,
+    policy/policies) and the extra forms given for it ("prohibit" ->
+    "prohibition"). "open" does not match "openly" and "may" does not match "mayor".
+    """
+
+    MAX_KEYWORDS = 64  # bitsets are stored as unsigned 64-bit integers
+    WORD = re.compile(r'[a-z0-9]+')
+    VOWELS = set('aeiou')
+
+    def __init__(self, keywords: Iterable[str], extra_forms: Dict[str, Iterable[str]] = None):
+        self.keywords = list(dict.fromkeys(keyword.lower() for keyword in keywords))
+
+        for keyword in self.keywords:
+            if not self.WORD.fullmatch(keyword):
+                raise ValueError(f"Keywords must be single words: {keyword!r}")
+        if len(self.keywords) > self.MAX_KEYWORDS:
+            raise ValueError(f"At most {self.MAX_KEYWORDS} keywords are supported")
+
+        self.bits = {keyword: 1 << index for index, keyword in enumerate(self.keywords)}
+
+        self.forms = {}
+        extra_forms = {keyword.lower(): forms for keyword, forms in (extra_forms or {}).items()}
+        for keyword, bit in self.bits.items():
+            forms = self.inflections(keyword) | {form.lower() for form in extra_forms.get(keyword, ())}
+            for form in forms:
+                self.forms[form] = self.forms.get(form, 0) | bit
+
+    @classmethod
+    def inflections(cls, word: str) -> Set[str]:
+        """A word plus its regular plural / verb forms"""
+        forms = {word, word + 's', word + 'es', word + 'ed', word + 'ing'}
+        if word.endswith('e'):
+            # close -> closed, closing
+            forms |= {word + 'd', word[:-1] + 'ing'}
+        if word.endswith('y') and word[-2:-1] not in cls.VOWELS:
+            # policy -> policies
+            forms |= {word[:-1] + 'ies', word[:-1] + 'ied'}
+        if (len(word) > 2 and word[-1] not in cls.VOWELS | set('wxy')
+                and word[-2] in cls.VOWELS and word[-3] not in cls.VOWELS):
+            # submit -> submitted, forbid -> forbidding
+            forms |= {word + word[-1] + 'ed', word + word[-1] + 'ing'}
+        return forms
+
+    def scan(self, sentence: str) -> int:
+        """Bitset of the keywords present in a sentence"""
+        found = 0
+        forms = self.forms
+        for token in self.WORD.findall(sentence.lower()):
+            found |= forms.get(token, 0)
+        return found
+
+    def mask(self, keywords: Iterable[str]) -> int:
+        """Bitset covering the given keywords"""
+        mask = 0
+        for keyword in keywords:
+            mask |= self.bits[keyword.lower()]
+        return mask
+
+    def present(self, found: int, keywords: List[str]) -> List[str]:
+        """The given keywords that are set in a bitset, in the given order"""
+        return [keyword for keyword in keywords if found & self.bits[keyword.lower()]]
@@ -0,0 +1,484 @@
+import os
+import re
+import mmap
+import math
+import tempfile
+from array import array
+from itertools import islice
+from typing import List, Dict, Tuple, Iterator, Callable
+
+import numpy as np
+
+from services.inference_server import InferenceError
+from config.config import Config
+
+
+class DiskSentenceStore:
+    """Append-only UTF-8 sentence file with a byte-offset index, read back through mmap"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._offsets = array('q', [0])
+        self._mmap = None
+
+    def append(self, sentence: str) -> int:
+        """Write a sentence to disk and return its sentence ID"""
+        data = sentence.encode('utf-8')
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        return len(self._offsets) - 2
+
+    def seal(self):
+        """Finish writing and map the file for reads"""
+        self._file.close()
+        self._file = open(self.path, 'rb')
+        if self._offsets[-1] > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, sentence_id: int) -> str:
+        start, stop = self._offsets[sentence_id], self._offsets[sentence_id + 1]
+        if start == stop:
+            return ''
+        return self._mmap[start:stop].decode('utf-8')
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+
+class EmbeddingShards:
+    """Embeddings written to np.memmap shards on disk
+
+    Only the shard being written stays mapped; reads map a shard just long
+    enough to copy rows out, so mapped pages never pile up in the process.
+    text(row) gives back the embedded text for the word-overlap fallback,
+    which is used when the model could not embed it (available is False).
+    """
+
+    def __init__(self, directory: str, name: str, shard_bytes: int, text: Callable[[int], str]):
+        self.directory = directory
+        self.name = name
+        self.shard_bytes = shard_bytes
+        self.text = text
+        self.available = True
+        self.shard_rows = None
+        self.paths = []
+        self.count = 0
+        self.dim = None
+        self._writing = None
+
+    def append(self, vectors: np.ndarray):
+        """Append a batch of embeddings as they came from the model"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self.shard_rows = max(1, self.shard_bytes // (self.dim * 4))
+
+        written = 0
+        while written < len(vectors):
+            shard_index, row = divmod(self.count, self.shard_rows)
+            if shard_index == len(self.paths):
+                self.flush()
+                path = os.path.join(self.directory, f"{self.name}-{shard_index:05d}.f32")
+                self.paths.append(path)
+                self._writing = np.memmap(path, dtype=np.float32, mode='w+',
+                                          shape=(self.shard_rows, self.dim))
+
+            take = min(self.shard_rows - row, len(vectors) - written)
+            self._writing[row:row + take] = vectors[written:written + take]
+            written += take
+            self.count += take
+
+    def flush(self):
+        """Write out and unmap the shard being filled"""
+        if self._writing is not None:
+            self._writing.flush()
+            self._writing = None
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        """Gather embedding rows by index into one in-memory block"""
+        self.flush()
+        block = np.empty((len(indices), self.dim), dtype=np.float32)
+        shard_ids, offsets = np.divmod(indices, self.shard_rows)
+        for shard_index in np.unique(shard_ids):
+            mask = shard_ids == shard_index
+            shard = np.memmap(self.paths[shard_index], dtype=np.float32, mode='r',
+                              shape=(self.shard_rows, self.dim))
+            block[mask] = shard[offsets[mask]]
+            del shard
+        return block
+
+
+class OutOfCoreAnalyzer:
+    """Runs ContradictionDetector's checks with intermediates on disk and tiled similarity
+
+    The memory budget is split four ways: similarity tiles, the hit buffer of
+    one row band, the embedding shard being written, and everything else.
+    """
+
+    # Sentence splitting runs on chunks of at most this many characters
+    # (spaCy refuses texts over 1,000,000 by default)
+    CHUNK_CHARS = 100000
+    # Bytes held per buffered similarity hit: row, column, score and sort index
+    HIT_BYTES = 32
+    # Tiles screen pairs with normalised float32 products, which can differ from
+    # the detector's cosine in the last bits; pairs within this margin of the
+    # threshold are rescored with the detector's own computation
+    SCREEN_MARGIN = 1e-4
+
+    def __init__(self, detector, memory_budget_mb: int = None, work_dir: str = None,
+                 encode_batch_size: int = 256):
+        if memory_budget_mb is None:
+            memory_budget_mb = Config.OUT_OF_CORE_MEMORY_MB
+        if memory_budget_mb <= 0:
+            raise ValueError(f"memory_budget_mb must be positive, got {memory_budget_mb}")
+
+        self.detector = detector
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.work_dir = work_dir or Config.ANALYSIS_WORK_DIR
+        self.encode_batch_size = encode_batch_size
+        self.max_hits = max(1, self.memory_budget // 4 // self.HIT_BYTES)
+
+        self._numerical_regexes = {
+            name: re.compile(pattern, re.IGNORECASE)
+            for name, pattern in detector.NUMERICAL_PATTERNS.items()
+        }
+        self._semantic_regexes = [
+            (re.compile(positive, re.IGNORECASE), re.compile(negative, re.IGNORECASE))
+            for positive, negative in detector.CONTRADICTION_PATTERNS
+        ]
+        self._context_masks = {
+            name: detector.keyword_matcher.mask(detector.CONTEXT_KEYWORDS.get(name, []))
+            for name in detector.NUMERICAL_PATTERNS
+        }
+
+    def detect(self, documents: Dict[str, str], max_results: int = None,
+               min_severity: float = None) -> List[Dict]:
+        """Detect contradictions with the same checks and order as the in-memory path"""
+        return list(self.iter_detect(documents, max_results, min_severity))
+
+    def iter_detect(self, documents: Dict[str, str], max_results: int = None,
+                    min_severity: float = None) -> Iterator[Dict]:
+        """Yield contradictions best-first as they are found, holding none of them back"""
+        if max_results is not None and max_results <= 0:
+            return
+
+        with tempfile.TemporaryDirectory(prefix='smart-doc-checker-', dir=self.work_dir) as work_dir:
+            store = DiskSentenceStore(os.path.join(work_dir, 'sentences.bin'))
+            contexts = DiskSentenceStore(os.path.join(work_dir, 'contexts.bin'))
+            try:
+                found = self._detect(documents, store, contexts, work_dir, min_severity)
+                yield from islice(found, max_results)
+            finally:
+                store.close()
+                contexts.close()
+
+    def _detect(self, documents: Dict[str, str], store: DiskSentenceStore,
+                contexts: DiskSentenceStore, work_dir: str, min_severity: float) -> Iterator[Dict]:
+        values = {}  # matched value -> value ID
+
+        doc_names = list(documents.keys())
+        doc_indexes = [
+            self._index_document(documents[name], store, contexts, values)
+            for name in doc_names
+        ]
+        store.seal()
+        contexts.seal()
+        value_list = list(values)
+
+        # Only sentences some detector compares need an embedding
+        candidates = np.unique(np.concatenate(
+            [index['policies'] for index in doc_indexes] +
+            [ids for index in doc_indexes for ids in index['positives'] + index['negatives']] +
+            [np.empty(0, dtype=np.int64)]
+        ))
+        shard_bytes = self.memory_budget // 4
+        sentence_shards = EmbeddingShards(work_dir, 'sentences', shard_bytes,
+                                          lambda row: store.get(int(candidates[row])))
+        self._embed(sentence_shards, (store.get(int(i)) for i in candidates))
+        sentence_shards.flush()
+
+        context_shards = EmbeddingShards(work_dir, 'contexts', shard_bytes, contexts.get)
+        self._embed(context_shards, (contexts.get(i) for i in range(len(contexts))))
+        context_shards.flush()
+
+        tiers = [
+            (self.detector.DETECTOR_SEVERITY['numerical'], lambda doc1, index1, doc2, index2:
+                self._numerical_contradictions(doc1, index1, doc2, index2, store, context_shards, value_list)),
+            (self.detector.DETECTOR_SEVERITY['policy'], lambda doc1, index1, doc2, index2:
+                self._policy_contradictions(doc1, index1, doc2, index2, store, sentence_shards, candidates)),
+            (self.detector.DETECTOR_SEVERITY['semantic'], lambda doc1, index1, doc2, index2:
+                self._semantic_contradictions(doc1, index1, doc2, index2, store, sentence_shards, candidates)),
+        ]
+        # Each detector reports one severity, so running the detectors highest
+        # severity first over all pairs yields findings already in final order
+        tiers.sort(key=lambda tier: tier[0], reverse=True)
+
+        for severity, detect in tiers:
+            if min_severity is not None and severity < min_severity:
+                continue
+            for i in range(len(doc_names)):
+                for j in range(i + 1, len(doc_names)):
+                    yield from detect(doc_names[i], doc_indexes[i], doc_names[j], doc_indexes[j])
+
+    def _iter_sentences(self, text: str) -> Iterator[str]:
+        """Split text into filtered sentences, at most CHUNK_CHARS of text at a time
+
+        The last sentence of a chunk may run past the cut, so it is dropped and
+        the next chunk starts where it starts: every sentence is split again
+        whole, with the text around it the whole-document split would see.
+        """
+        start = 0
+        while start < len(text):
+            stop = start + self.CHUNK_CHARS
+            chunk = text[start:stop]
+            sentences = self.detector._split_sentences(chunk)
+
+            if stop < len(text):
+                last = len(sentences) - 1
+                while last >= 0 and not sentences[last].strip():
+                    last -= 1
+                # The raw piece, leading whitespace included, as the length filter sees it
+                seam = chunk.rfind(sentences[last]) if last >= 0 else -1
+                if seam > 0:
+                    sentences = sentences[:last]
+                    stop = start + seam
+
+            yield from self.detector._filter_sentences(sentences)
+            start = stop
+
+    def _index_document(self, text: str, store: DiskSentenceStore, contexts: DiskSentenceStore,
+                        values: Dict[str, int]) -> Dict:
+        """Spill a document's sentences to disk chunk by chunk, keeping only compact ID arrays"""
+        numerical = {name: (array('q'), array('q'), array('q')) for name in self._numerical_regexes}
+        positives = [array('q') for _ in self._semantic_regexes]
+        negatives = [array('q') for _ in self._semantic_regexes]
+        policies = array('q')
+        policy_keywords = array('Q')
+        hashes = array('q')
+        keyword_contexts = {}  # keyword-built contexts repeat, so embed each once
+
+        start = len(store)
+        for sentence in self._iter_sentences(text):
+            sentence_id = store.append(sentence)
+            hashes.append(hash(sentence))
+            keywords = self.detector.keyword_matcher.scan(sentence)
+
+            for pattern_name, regex in self._numerical_regexes.items():
+                found_values = regex.findall(sentence)
+                if found_values:
+                    context = self.detector._extract_context(sentence, pattern_name, keywords)
+                    if keywords & self._context_masks[pattern_name]:
+                        context_row = keyword_contexts.get(context)
+                        if context_row is None:
+                            context_row = keyword_contexts[context] = contexts.append(context)
+                    else:
+                        context_row = contexts.append(context)
+                    context_rows, value_ids, sentence_ids = numerical[pattern_name]
+                    for value in found_values:
+                        context_rows.append(context_row)
+                        value_ids.append(values.setdefault(value, len(values)))
+                        sentence_ids.append(sentence_id)
+
+            for k, (positive, negative) in enumerate(self._semantic_regexes):
+                if positive.search(sentence):
+                    positives[k].append(sentence_id)
+                if negative.search(sentence):
+                    negatives[k].append(sentence_id)
+
+            if self.detector._is_policy_statement(sentence, keywords):
+                policies.append(sentence_id)
+                policy_keywords.append(keywords)
+
+        # Sorted text hashes give exact `sentence in document` checks without keeping the text
+        hashes = np.array(hashes, dtype=np.int64)
+        order = np.argsort(hashes, kind='stable')
+
+        return {
+            'numerical': {
+                name: tuple(np.array(column, dtype=np.int64) for column in columns)
+                for name, columns in numerical.items()
+            },
+            'positives': [np.array(ids, dtype=np.int64) for ids in positives],
+            'negatives': [np.array(ids, dtype=np.int64) for ids in negatives],
+            'policies': np.array(policies, dtype=np.int64),
+            'policy_keywords': np.array(policy_keywords, dtype=np.uint64),
+            'hashes': hashes[order],
+            'hash_ids': order + start
+        }
+
+    def _embed(self, shards: EmbeddingShards, texts: Iterator[str]):
+        """Encode texts in bounded batches straight into the on-disk shards
+
+        Like the in-memory path, a failing local model switches similarity to
+        word overlap, while inference server errors propagate.
+        """
+        while True:
+            batch = list(islice(texts, self.encode_batch_size))
+            if not batch:
+                break
+            try:
+                embeddings = np.array(self.detector.sentence_model.encode(batch), dtype=np.float32)
+            except InferenceError:
+                raise
+            except Exception:
+                shards.available = False
+                return
+            # The in-memory path scores empty text as 0.0 similarity
+            embeddings[[k for k, text in enumerate(batch) if not text]] = 0.0
+            shards.append(embeddings)
+
+    def _tile_size(self, dim: int) -> int:
+        # A quarter of the budget holds two raw and two normalised embedding blocks
+        # (16*t*dim bytes) plus the float32 similarity and boolean hit matrices (5*t*t bytes)
+        budget = self.memory_budget // 4
+        tile = int(-1.6 * dim + math.sqrt(2.56 * dim * dim + budget / 5))
+        if tile < 1:
+            raise ValueError(f"Memory budget of {self.memory_budget} bytes is too small "
+                             f"for {dim}-dimensional embeddings")
+        return tile
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        """Unit-length rows for screening; zero vectors become NaN and never match"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _similar_pairs(self, shards: EmbeddingShards, left_rows: np.ndarray, right_rows: np.ndarray,
+                       threshold: float) -> Iterator[Tuple[int, int, float]]:
+        """Yield (left, right, similarity) above threshold in row-major order, one tile at a time"""
+        if len(left_rows) == 0 or len(right_rows) == 0:
+            return
+
+        if not shards.available:
+            for a, left_row in enumerate(left_rows):
+                text1 = shards.text(int(left_row))
+                for b, right_row in enumerate(right_rows):
+                    # No embeddings: the detector falls back to word overlap
+                    similarity = self.detector._calculate_context_similarity(
+                        text1, shards.text(int(right_row)), {}
+                    )
+                    if similarity > threshold:
+                        yield a, b, similarity
+            return
+
+        tile = self._tile_size(shards.dim)
+        for row_start in range(0, len(left_rows), tile):
+            row_stop = min(row_start + tile, len(left_rows))
+            yield from self._similar_band(shards, left_rows, right_rows, threshold,
+                                          row_start, row_stop, tile)
+
+    def _similar_band(self, shards: EmbeddingShards, left_rows: np.ndarray, right_rows: np.ndarray,
+                      threshold: float, row_start: int, row_stop: int,
+                      tile: int) -> Iterator[Tuple[int, int, float]]:
+        """Row-major hits for left rows [row_start, row_stop); a band with too many hits is halved"""
+        left_raw = shards.rows(left_rows[row_start:row_stop])
+        left = self._normalise(left_raw)
+        screen = threshold - self.SCREEN_MARGIN
+
+        if row_stop - row_start == 1:
+            # A single row's hits come out in order, so stream them tile by tile
+            for col_start in range(0, len(right_rows), tile):
+                right_raw = shards.rows(right_rows[col_start:col_start + tile])
+                screened = (left @ self._normalise(right_raw).T)[0]
+                for col in np.nonzero(screened > screen)[0]:
+                    similarity = self.detector._cosine_similarity(left_raw[0], right_raw[col])
+                    if similarity > threshold:
+                        yield row_start, int(col) + col_start, similarity
+            return
+
+        hits = []
+        hit_count = 0
+        for col_start in range(0, len(right_rows), tile):
+            right_raw = shards.rows(right_rows[col_start:col_start + tile])
+            screened = left @ self._normalise(right_raw).T
+            rows, cols = np.nonzero(screened > screen)
+            hit_count += len(rows)
+            if hit_count > self.max_hits:
+                # Too many hits to sort within budget: drop them and split the band
+                hits = None
+                break
+            scores = np.array([self.detector._cosine_similarity(left_raw[r], right_raw[c])
+                               for r, c in zip(rows, cols)], dtype=np.float64)
+            keep = scores > threshold
+            hits.append((rows[keep] + row_start, cols[keep] + col_start, scores[keep]))
+
+        if hits is None:
+            middle = (row_start + row_stop) // 2
+            yield from self._similar_band(shards, left_rows, right_rows, threshold, row_start, middle, tile)
+            yield from self._similar_band(shards, left_rows, right_rows, threshold, middle, row_stop, tile)
+            return
+
+        rows = np.concatenate([hit[0] for hit in hits])
+        cols = np.concatenate([hit[1] for hit in hits])
+        scores = np.concatenate([hit[2] for hit in hits])
+        for k in np.lexsort((cols, rows)):
+            yield int(rows[k]), int(cols[k]), float(scores[k])
+
+    def _document_contains(self, index: Dict, sentence: str, store: DiskSentenceStore) -> bool:
+        """Exact membership test against a document's sentences"""
+        sentence_hash = hash(sentence)
+        lo = np.searchsorted(index['hashes'], sentence_hash, side='left')
+        hi = np.searchsorted(index['hashes'], sentence_hash, side='right')
+        return any(store.get(int(i)) == sentence for i in index['hash_ids'][lo:hi])
+
+    def _numerical_contradictions(self, doc1_name: str, index1: Dict, doc2_name: str, index2: Dict,
+                                  store: DiskSentenceStore, context_shards: EmbeddingShards,
+                                  value_list: List[str]) -> Iterator[Dict]:
+        for pattern_name in self._numerical_regexes:
+            rows1, values1, ids1 = index1['numerical'][pattern_name]
+            rows2, values2, ids2 = index2['numerical'][pattern_name]
+
+            for a, b, similarity in self._similar_pairs(context_shards, rows1, rows2, 0.7):
+                if values1[a] != values2[b]:  # Same context, different values
+                    yield self.detector._numerical_contradiction(
+                        pattern_name, doc1_name, doc2_name,
+                        store.get(int(ids1[a])), store.get(int(ids2[b])),
+                        value_list[values1[a]], value_list[values2[b]], similarity
+                    )
+
+    def _semantic_contradictions(self, doc1_name: str, index1: Dict, doc2_name: str, index2: Dict,
+                                 store: DiskSentenceStore, sentence_shards: EmbeddingShards,
+                                 candidates: np.ndarray) -> Iterator[Dict]:
+        for k in range(len(self._semantic_regexes)):
+            positives = np.concatenate([index1['positives'][k], index2['positives'][k]])
+            negatives = np.concatenate([index1['negatives'][k], index2['negatives'][k]])
+            pos_rows = np.searchsorted(candidates, positives)
+            neg_rows = np.searchsorted(candidates, negatives)
+
+            for a, b, similarity in self._similar_pairs(sentence_shards, pos_rows, neg_rows, 0.6):
+                pos_sent = store.get(int(positives[a]))
+                neg_sent = store.get(int(negatives[b]))
+                doc1_has_pos = (a < len(index1['positives'][k]) or
+                                self._document_contains(index1, pos_sent, store))
+                doc1_has_neg = (b < len(index1['negatives'][k]) or
+                                self._document_contains(index1, neg_sent, store))
+
+                if (doc1_has_pos and not doc1_has_neg) or (not doc1_has_pos and doc1_has_neg):
+                    yield self.detector._semantic_contradiction(
+                        doc1_name if doc1_has_pos else doc2_name,
+                        doc2_name if doc1_has_pos else doc1_name,
+                        pos_sent, neg_sent, similarity
+                    )
+
+    def _policy_contradictions(self, doc1_name: str, index1: Dict, doc2_name: str, index2: Dict,
+                               store: DiskSentenceStore, sentence_shards: EmbeddingShards,
+                               candidates: np.ndarray) -> Iterator[Dict]:
+        policies1, policies2 = index1['policies'], index2['policies']
+        rows1 = np.searchsorted(candidates, policies1)
+        rows2 = np.searchsorted(candidates, policies2)
+
+        for a, b, similarity in self._similar_pairs(sentence_shards, rows1, rows2, 0.7):
+            policy1 = store.get(int(policies1[a]))
+            policy2 = store.get(int(policies2[b]))
+            if self.detector._are_policies_contradictory(
+                    policy1, policy2,
+                    int(index1['policy_keywords'][a]), int(index2['policy_keywords'][b])):
+                yield self.detector._policy_contradiction(
+                    doc1_name, doc2_name, policy1, policy2, similarity
+                )
@@ -0,0 +1,166 @@
+import os
+import sys
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Dict, Tuple, Iterator
+
+import numpy as np
+
+from services.sentence_store import SentenceStore
+
+
+class SharedSentenceStore:
+    """A sealed SentenceStore's arrays and text buffer copied into one shared-memory block"""
+
+    # (attribute, dtype) in block order; the UTF-8 text buffer follows
+    LAYOUT = [
+        ('text_offsets', np.int64),
+        ('text_keywords', np.uint64),
+        ('sentence_texts', np.int64),
+        ('sentence_docs', np.int32),
+        ('doc_bounds', np.int64),
+    ]
+
+    def __init__(self, shm: shared_memory.SharedMemory, doc_names: List[str], lengths: List[int]):
+        self.shm = shm
+        self.doc_names = doc_names
+        self.lengths = lengths
+
+        offset = 0
+        self.arrays = {}
+        for (name, dtype), length in zip(self.LAYOUT, lengths):
+            self.arrays[name] = np.ndarray((length,), dtype=dtype, buffer=shm.buf, offset=offset)
+            offset += self.arrays[name].nbytes
+        self.text_start = offset
+
+    @classmethod
+    def create(cls, store: SentenceStore) -> 'SharedSentenceStore':
+        sources = [np.asarray(getattr(store, name), dtype=dtype) for name, dtype in cls.LAYOUT]
+        lengths = [len(source) for source in sources]
+        size = sum(source.nbytes for source in sources) + len(store.buffer)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(shm, store.doc_names, lengths)
+        for (name, _), source in zip(cls.LAYOUT, sources):
+            shared.arrays[name][:] = source
+        shm.buf[shared.text_start:size] = store.buffer
+        return shared
+
+    @classmethod
+    def attach(cls, name: str, doc_names: List[str], lengths: List[int]) -> 'SharedSentenceStore':
+        return cls(shared_memory.SharedMemory(name=name), doc_names, lengths)
+
+    def store(self) -> SentenceStore:
+        """A read-only SentenceStore view over the shared block"""
+        text_end = self.text_start + int(self.arrays['text_offsets'][-1])
+        return SentenceStore.from_arrays(
+            self.doc_names, self.shm.buf[self.text_start:text_end], **self.arrays
+        )
+
+    def close(self):
+        # Views into the buffer must go before the mapping can close
+        self.arrays.clear()
+        self.shm.close()
+
+    def release(self):
+        """Close and remove the block; its creator calls this once the analysis is done"""
+        self.close()
+        self.shm.unlink()
+
+
+# Per-worker state: the detector, set once by _init_worker, and the shared
+# stores of recent analyses attached by block name, least recently used first
+_worker_detector = None
+_worker_stores = OrderedDict()
+MAX_ATTACHED_STORES = 4
+
+
+def _init_worker(detector, workers: int):
+    global _worker_detector
+
+    # Split the cores between workers instead of every worker starting one torch thread per core
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+    # The fork copied the parent's connection state; workers open their own
+    if detector.inference_client:
+        detector.inference_client.reset_after_fork()
+
+    _worker_detector = detector
+
+
+def _attached_store(shm_name: str, lengths: List[int]) -> SentenceStore:
+    if shm_name in _worker_stores:
+        _worker_stores.move_to_end(shm_name)
+        return _worker_stores[shm_name][1]
+
+    shared = SharedSentenceStore.attach(shm_name, [], lengths)
+    _worker_stores[shm_name] = (shared, shared.store())
+    while len(_worker_stores) > MAX_ATTACHED_STORES:
+        _, (old_shared, old_store) = _worker_stores.popitem(last=False)
+        old_store.buffer.release()
+        del old_store
+        old_shared.close()
+    return _worker_stores[shm_name][1]
+
+
+def _run_work_unit(shm_name: str, lengths: List[int], detector_name: str,
+                   doc1: int, doc2: int) -> List[Dict]:
+    detect = getattr(_worker_detector, detector_name)
+    return detect(_attached_store(shm_name, lengths), doc1, doc2)
+
+
+class PairComparisonPool:
+    """Runs (detector, document pair) work units across a long-lived pool of forked workers
+
+    The pool is forked once and reused by every analysis; each analysis shares
+    its SentenceStore with the workers through share() and releases it when done.
+
+    Fork copies only the calling thread. Any lock another thread holds at that
+    moment (in logging, the model libraries, ...) stays locked forever in the
+    workers, so build the pool from a process that is not serving requests on
+    other threads: a CLI run or a dedicated analysis process, not a threaded
+    Flask worker. The inference client's connection state is reset in each worker.
+    """
+
+    def __init__(self, detector, max_workers: int):
+        self.max_workers = max_workers
+
+        # Forked workers inherit the already-loaded models (or the inference client)
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker,
+            initargs=(detector, max_workers)
+        )
+
+    @staticmethod
+    def available() -> bool:
+        return 'fork' in multiprocessing.get_all_start_methods()
+
+    @staticmethod
+    def share(store: SentenceStore) -> SharedSentenceStore:
+        """Copy a sealed store into shared memory for the workers; release() it afterwards"""
+        return SharedSentenceStore.create(store)
+
+    def map(self, shared: SharedSentenceStore,
+            units: List[Tuple[str, int, int]]) -> Iterator[List[Dict]]:
+        """Submit every (detector name, doc1, doc2) unit at once and yield results in unit order"""
+        futures = [
+            self.executor.submit(_run_work_unit, shared.shm.name, shared.lengths,
+                                 detector_name, doc1, doc2)
+            for detector_name, doc1, doc2 in units
+        ]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # Early termination drops the work units nobody will read
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,108 @@
+from array import array
+from typing import List, Dict, Sequence, Callable
+
+
+class SentenceStore:
+    """Per-analysis sentence store: interned UTF-8 text in one buffer, addressed by integer IDs
+
+    Every sentence occurrence gets a sentence ID. Identical sentence text is stored
+    once and shared through a text ID, so "is this sentence in that document" is a
+    set lookup on text IDs. Findings built during analysis carry document and
+    sentence IDs in their 'document1'/'document2'/'sentence1'/'sentence2' fields;
+    resolve() swaps in the names and text when the report is produced.
+    """
+
+    def __init__(self):
+        self.doc_names = []
+        self.buffer = b''
+        self.text_offsets = array('q', [0])    # text ID -> byte offset in buffer
+        self.text_keywords = array('Q')        # text ID -> keyword bitset
+        self.sentence_texts = array('q')       # sentence ID -> text ID
+        self.sentence_docs = array('i')        # sentence ID -> document ID
+        self.doc_bounds = array('q', [0])      # document ID -> first sentence ID
+        self._chunks = []
+        self._interned = {}
+        self._doc_texts = {}
+
+    @classmethod
+    def from_arrays(cls, doc_names: List[str], buffer: Sequence, text_offsets: Sequence,
+                    text_keywords: Sequence, sentence_texts: Sequence, sentence_docs: Sequence,
+                    doc_bounds: Sequence) -> 'SentenceStore':
+        """Wrap existing (e.g. shared-memory) arrays as a sealed, read-only store"""
+        store = cls()
+        store.doc_names = doc_names
+        store.buffer = buffer
+        store.text_offsets = text_offsets
+        store.text_keywords = text_keywords
+        store.sentence_texts = sentence_texts
+        store.sentence_docs = sentence_docs
+        store.doc_bounds = doc_bounds
+        store._interned = None
+        return store
+
+    def add_document(self, doc_name: str, sentences: List[str],
+                     keyword_scanner: Callable[[str], int] = None) -> int:
+        """Intern a document's sentences and return its document ID
+
+        keyword_scanner, if given, runs once per distinct sentence text and its
+        bitset is kept for keywords().
+        """
+        doc_id = len(self.doc_names)
+        self.doc_names.append(doc_name)
+
+        for sentence in sentences:
+            text_id = self._interned.get(sentence)
+            if text_id is None:
+                data = sentence.encode('utf-8')
+                text_id = len(self.text_offsets) - 1
+                self._interned[sentence] = text_id
+                self._chunks.append(data)
+                self.text_offsets.append(self.text_offsets[-1] + len(data))
+                self.text_keywords.append(keyword_scanner(sentence) if keyword_scanner else 0)
+            self.sentence_texts.append(text_id)
+            self.sentence_docs.append(doc_id)
+
+        self.doc_bounds.append(len(self.sentence_texts))
+        return doc_id
+
+    def seal(self):
+        """Join the text into one buffer and drop the interning table"""
+        self.buffer = b''.join(self._chunks)
+        self._chunks = []
+        self._interned = None
+
+    @property
+    def document_count(self) -> int:
+        return len(self.doc_names)
+
+    def document_sentences(self, doc_id: int) -> range:
+        """Sentence IDs of one document, in document order"""
+        return range(self.doc_bounds[doc_id], self.doc_bounds[doc_id + 1])
+
+    def text(self, sentence_id: int) -> str:
+        text_id = self.sentence_texts[sentence_id]
+        return str(self.buffer[self.text_offsets[text_id]:self.text_offsets[text_id + 1]], 'utf-8')
+
+    def keywords(self, sentence_id: int) -> int:
+        """Keyword bitset computed for the sentence's text when it was added"""
+        return int(self.text_keywords[self.sentence_texts[sentence_id]])
+
+    def contains(self, doc_id: int, sentence_id: int) -> bool:
+        """O(1) check whether a document has a sentence with the same text"""
+        if self.sentence_docs[sentence_id] == doc_id:
+            return True
+        if doc_id not in self._doc_texts:
+            self._doc_texts[doc_id] = {self.sentence_texts[i] for i in self.document_sentences(doc_id)}
+        return self.sentence_texts[sentence_id] in self._doc_texts[doc_id]
+
+    def resolve(self, finding: Dict) -> Dict:
+        """Fill in document names and sentence text for a finding built on IDs"""
+        resolved = dict(finding)
+        resolved['document1'] = self.doc_names[finding['document1']]
+        resolved['document2'] = self.doc_names[finding['document2']]
+        resolved['sentence1'] = self.text(finding['sentence1'])
+        resolved['sentence2'] = self.text(finding['sentence2'])
+        return resolved
+
+    def __len__(self) -> int:
+        return len(self.sentence_texts)
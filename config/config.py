@@ -1,4 +1,6 @@
 import os
+import getpass
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,3 +14,13 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     REPORTS_FOLDER = 'reports'
     MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+    # Private per-user directory for the default inference socket and generated key
+    INFERENCE_RUNTIME_DIR = os.getenv('INFERENCE_RUNTIME_DIR') or os.path.join(
+        os.getenv('XDG_RUNTIME_DIR') or tempfile.gettempdir(), f'smart-doc-checker-{getpass.getuser()}'
+    )
+    INFERENCE_SOCKET = os.getenv('INFERENCE_SOCKET') or os.path.join(INFERENCE_RUNTIME_DIR, 'inference.sock')
+    INFERENCE_AUTHKEY = os.getenv('INFERENCE_AUTHKEY')  # None -> key generated in INFERENCE_RUNTIME_DIR
+    OUT_OF_CORE_MEMORY_MB = int(os.getenv('OUT_OF_CORE_MEMORY_MB', '256'))
+    ANALYSIS_WORK_DIR = os.getenv('ANALYSIS_WORK_DIR')  # None -> system temp dir
+    # Forked pair-comparison processes; keep 1 in threaded web workers (see PairComparisonPool)
+    ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '1'))